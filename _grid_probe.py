@@ -0,0 +1,86 @@
+"""
+Shared helpers for the benchmark, validation and pattern-check scripts
+
+Grid construction, the vectorized invariant checks, timing and the
+per-size process pool live here so every script uses one implementation.
+"""
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import lru_cache
+
+import numpy as np
+
+from app import HexGrid
+
+@lru_cache(maxsize=None)
+def proto_grid(size):
+    """One organized grid per size; callers work on clones of it"""
+    return HexGrid(size)
+
+# Odd-Q (dc, dr) offsets in door order N, NE, SE, S, SW, NW, by column
+# parity; kept independent of app.py so the LUT cross-checks its tables
+_OFFSETS = np.array([
+    [(0, -1), (1, -1), (1, 0), (0, 1), (-1, 0), (-1, -1)],  # even columns
+    [(0, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0)],    # odd columns
+], dtype=np.int32)
+
+@lru_cache(maxsize=None)
+def neighbor_lut(size):
+    """(size, size, 6, 2) int32 table of the (c, r) neighbor across each door"""
+    c, r = np.meshgrid(np.arange(size, dtype=np.int32),
+                       np.arange(size, dtype=np.int32), indexing='ij')
+    coords = np.stack([c, r], axis=-1)[:, :, None, :]
+    lut = (coords + _OFFSETS[c & 1]) % size
+    lut.setflags(write=False)
+    return lut
+
+def _door_bits(g):
+    """(size, size, 6) array of per-direction door bits"""
+    return np.unpackbits(g.cells_array[..., None], axis=-1, bitorder='little')[..., :6]
+
+def probe_invariants(g):
+    """Degree and symmetry checks in one pass over cells_array
+
+    Returns (deg, missing): deg[c, r] is the door count of each cell, and
+    missing[c, r, d] is True where door d is open but the neighbor's
+    opposite door is not.
+    """
+    # Per-direction door bits, unpacked once and shared by both checks
+    doors = _door_bits(g)
+    deg = doors.sum(-1)
+
+    # Each cell's neighbor across every door, and that neighbor's
+    # opposite-door bit: (size, size, 6)
+    nb = neighbor_lut(g.size)
+    opp = (np.arange(6) + 3) % 6
+    back = doors[nb[..., 0], nb[..., 1], opp]
+    missing = (doors == 1) & (back == 0)
+    return deg, missing
+
+def probe_loops(loops):
+    """int32 array of the length of each loop"""
+    return np.fromiter(map(len, loops), dtype=np.int32, count=len(loops))
+
+def timed(fn, *args):
+    """Call fn(*args); returns (result, elapsed nanoseconds)"""
+    start = time.perf_counter_ns()
+    result = fn(*args)
+    return result, time.perf_counter_ns() - start
+
+def capture(fn, *args):
+    """Call fn(*args) with stdout captured; returns (result, output)"""
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        result = fn(*args)
+    return result, buf.getvalue()
+
+def map_sizes(task, sizes):
+    """Run task(size) for every size in a process pool; results in order
+
+    task must be a module-level function so it can be pickled.
+    """
+    with ProcessPoolExecutor(max_workers=min(len(sizes), os.cpu_count() or 1)) as ex:
+        return list(ex.map(task, sizes))
@@ -1,11 +1,34 @@
+import base64
+import copy
 import random
-from flask import Flask, jsonify, request, send_from_directory
+import warnings
+from flask import Flask, Response, request, send_from_directory
+from flask.json.provider import JSONProvider
 import numpy as np
-from numba import jit
+import orjson
+from numba import jit, types
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson (compiled encoder) instead of stdlib json"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping str round-trips
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
 
 app = Flask(__name__, static_folder='.', static_url_path='')
+app.json = OrjsonProvider(app)
 
 GRID_SIZE = 10
+# Sizes accepted by /reset
+MIN_GRID_SIZE = 5
+MAX_GRID_SIZE = 200
 # Directions for Odd-Q Offset Coordinates (Flat Topped)
 # Even cols (c%2 == 0):
 #   N (0, -1), NE (1, -1), SE (1, 0), S (0, 1), SW (-1, 0), NW (-1, -1)
@@ -38,145 +61,364 @@ ODD_COL_DIRS = [
     (-1, 0)   # 5: NW
 ]
 
-@jit(nopython=True, cache=True)
-def _find_loops_numba(cells_array, neighbor_table, size):
-    """Numba-optimized core loop finding logic"""
-    visited = np.zeros((size, size), dtype=np.bool_)
-
-    # Store all loops as list of coordinate arrays
-    # We can't return a list of lists directly from nopython mode easily if they are irregular
-    # So we'll return a list of arrays, where each array is a loop
-    # Numba supports lists of arrays in nopython mode
-    all_loops = []
-
-    for start_c in range(size):
-        for start_r in range(size):
-            if visited[start_c, start_r]:
-                continue
-
-            # Pre-allocate loop storage
-            # Max loop size is size*size
-            loop_coords = np.empty((size * size, 2), dtype=np.int16)
-            loop_len = 0
-
-            curr_c, curr_r = start_c, start_r
-            prev_c, prev_r = np.int16(-1), np.int16(-1)
-
-            # Traverse loop
-            # Use a safe upper bound for iterations to avoid infinite loops in case of bugs
-            for _ in range(size * size + 1):
-                # Check termination
-                if visited[curr_c, curr_r]:
-                    if curr_c == start_c and curr_r == start_r and loop_len > 0:
-                        break  # Completed loop
-                    else:
-                        loop_len = 0  # Hit another loop or merged into existing path
-                        break
-
-                # Mark visited and record
-                visited[curr_c, curr_r] = True
-                loop_coords[loop_len, 0] = curr_c
-                loop_coords[loop_len, 1] = curr_r
-                loop_len += 1
-
-                # Extract doors from bit flags
-                bits = cells_array[curr_c, curr_r]
-                doors = np.empty(6, dtype=np.int8)
-                door_count = 0
-                for dir_idx in range(6):
-                    if bits & (1 << dir_idx):
-                        doors[door_count] = dir_idx
-                        door_count += 1
-
-                if door_count == 0:
-                    loop_len = 0
+# (6, 2) offset arrays for building the neighbor table with broadcasting
+EVEN_COL_OFFSETS = np.array(EVEN_COL_DIRS, dtype=np.int64)
+ODD_COL_OFFSETS = np.array(ODD_COL_DIRS, dtype=np.int64)
+
+# DOOR_LISTS[bits] -> door directions set in a 6-bit mask (tuples, so the
+# shared entries can't be mutated by callers)
+DOOR_LISTS = [tuple(d for d in range(6) if m >> d & 1) for m in range(64)]
+
+# Lookup tables for branchless random door selection in the Numba kernels:
+# POPCOUNT[bits] = number of doors, NTH_SET[bits, n] = direction of the
+# n-th door (-1 padded)
+POPCOUNT = np.array([m.bit_count() for m in range(64)], dtype=np.int8)
+NTH_SET = np.full((64, 6), -1, dtype=np.int8)
+for _m, _doors in enumerate(DOOR_LISTS):
+    NTH_SET[_m, :len(_doors)] = _doors
+
+# OPP[dir_idx] -> opposite direction, (dir_idx + 3) % 6
+OPP = np.array([3, 4, 5, 0, 1, 2], dtype=np.int8)
+
+# NEXT_DOOR[bits, came_from + 1] -> first door of bits other than came_from
+# (the direction back to the previous cell), or -1 for a dead end. Column 0
+# (came_from = -1) is the first door, for the start of a walk.
+NEXT_DOOR = np.full((64, 7), -1, dtype=np.int8)
+for _m, _doors in enumerate(DOOR_LISTS):
+    if _doors:
+        NEXT_DOOR[_m, 0] = _doors[0]
+    for _back in range(6):
+        _rest = [d for d in _doors if d != _back]
+        if _rest:
+            NEXT_DOOR[_m, _back + 1] = _rest[0]
+del _m, _doors, _back, _rest
+
+# The Numba kernels carry explicit signatures, so each is compiled (or
+# loaded from the on-disk cache) eagerly at import time rather than on the
+# first request. Arrays passed in must match: C-contiguous, these dtypes.
+# neighbor_flat is shared between grids and kept read-only.
+_NEIGHBOR_FLAT = types.Array(types.int32, 2, 'C', readonly=True)
+
+@jit(types.int64(_NEIGHBOR_FLAT, types.int64, types.int64),
+     nopython=True, cache=True)
+def _direction_numba(neighbor_flat, a, b):
+    """Direction from cell id a to neighbor id b, or -1 if not adjacent"""
+    for dir_idx in range(6):
+        if neighbor_flat[a, dir_idx] == b:
+            return dir_idx
+    return -1
+
+@jit(types.Tuple((types.int32[:, ::1], types.int32[:]))(
+         types.uint8[::1], _NEIGHBOR_FLAT, types.int64),
+     nopython=True, cache=True)
+def _find_loops_numba(cells_flat, neighbor_flat, size):
+    """Numba-optimized core loop finding logic
+
+    Works on flat cell ids (c*size + r): cells_flat is cells_array.ravel()
+    and neighbor_flat[id, dir_idx] is the neighbor's id.
+
+    Returns (coords, lengths): coords is an (n, 2) int32 buffer holding the
+    cells of every loop back to back, and lengths[i] is the length of loop i.
+    """
+    num_cells = size * size
+    visited = np.zeros(num_cells, dtype=np.uint8)
+
+    # Every cell belongs to at most one loop, so num_cells bounds both buffers
+    loop_ids = np.empty(num_cells, dtype=np.int32)
+    lengths = np.empty(num_cells, dtype=np.int32)
+    num_loops = 0
+    total = 0  # Cells committed to loop_ids so far
+
+    for start in range(num_cells):
+        if visited[start]:
+            continue
+        if POPCOUNT[cells_flat[start]] == 0:
+            # Isolated cell: can't be on a loop, skip the traversal setup
+            visited[start] = 1
+            continue
+
+        loop_len = 0
+        curr = start
+        prev = -1
+        came_from = -1  # Direction from curr back to prev
+
+        # Traverse loop
+        # Use a safe upper bound for iterations to avoid infinite loops in case of bugs
+        for _ in range(num_cells + 1):
+            # Check termination
+            if visited[curr]:
+                if curr == start and loop_len > 0:
+                    break  # Completed loop
+                else:
+                    loop_len = 0  # Hit another loop or merged into existing path
                     break
 
-                # Find next cell (avoiding backtrack)
-                next_c, next_r = np.int16(-1), np.int16(-1)
-                
-                # Default to first door
-                found_next = False
-                
-                for i in range(door_count):
-                    dir_idx = doors[i]
-                    nc = np.int16(neighbor_table[curr_c, curr_r, dir_idx, 0])
-                    nr = np.int16(neighbor_table[curr_c, curr_r, dir_idx, 1])
-
-                    # Skip if this is where we came from
-                    if prev_c >= 0 and nc == prev_c and nr == prev_r:
-                        continue
-
-                    next_c, next_r = nc, nr
-                    found_next = True
-                    break
-                
-                if not found_next:
-                     loop_len = 0
-                     break
+            # Mark visited and record (uncommitted until the loop closes)
+            visited[curr] = 1
+            loop_ids[total + loop_len] = curr
+            loop_len += 1
+
+            # First door that doesn't backtrack, in a single table load
+            next_dir = NEXT_DOOR[cells_flat[curr], came_from + 1]
+            if next_dir < 0:
+                loop_len = 0  # No doors, or dead end
+                break
 
-                prev_c, prev_r = curr_c, curr_r
-                curr_c, curr_r = next_c, next_r
+            prev = curr
+            curr = neighbor_flat[curr, next_dir]
+            came_from = (next_dir + 3) % 6
+            if neighbor_flat[curr, came_from] != prev:
+                # Odd sizes wrap asymmetrically; find the way back (or -1)
+                came_from = _direction_numba(neighbor_flat, curr, prev)
+
+        # Commit valid loop
+        if loop_len > 0:
+            lengths[num_loops] = loop_len
+            num_loops += 1
+            total += loop_len
+
+    # Unpack ids to (c, r) only for the output
+    coords = np.empty((total, 2), dtype=np.int32)
+    for i in range(total):
+        coords[i, 0] = loop_ids[i] // size
+        coords[i, 1] = loop_ids[i] % size
+
+    return coords, lengths[:num_loops]
+
+@jit(types.void(types.uint8[::1], types.int64, types.int64, types.int64, types.int64,
+                types.int64, types.int64, types.int64, types.int64),
+     nopython=True, cache=True)
+def _swap_edges_numba(cells_flat, u, v, x, y, dir_uv, dir_xy, dir_ux, dir_vy):
+    """Rewire edges u-v, x-y into u-x, v-y: one read-modify-write per cell"""
+    cells_flat[u] = (cells_flat[u] & ~(1 << dir_uv)) | (1 << dir_ux)
+    cells_flat[v] = (cells_flat[v] & ~(1 << OPP[dir_uv])) | (1 << dir_vy)
+    cells_flat[x] = (cells_flat[x] & ~(1 << dir_xy)) | (1 << OPP[dir_ux])
+    cells_flat[y] = (cells_flat[y] & ~(1 << OPP[dir_xy])) | (1 << OPP[dir_vy])
+
+@jit(types.int64(types.uint8[::1], _NEIGHBOR_FLAT, types.int32[:, ::1],
+                 types.float64[:, ::1], types.int64),
+     nopython=True, cache=True)
+def _scramble_numba(cells_flat, neighbor_flat, random_cells, door_picks, steps):
+    """Numba-optimized MCMC swap loop; mutates cells_flat in place
+
+    Works on flat cell ids like _find_loops_numba. random_cells[i] = [u, x]
+    (cell ids) and door_picks[i] = [pick_u, pick_x] (uniform in [0, 1))
+    drive attempt i. Returns the number of swaps made.
+    """
+    swaps = 0
+    for attempt in range(random_cells.shape[0]):
+        if swaps >= steps:
+            break
+
+        u = random_cells[attempt, 0]
+        x = random_cells[attempt, 1]
+
+        # Pick a random door of u, scaling the uniform pick to the door count
+        u_bits = cells_flat[u]
+        u_count = POPCOUNT[u_bits]
+        if u_count == 0:
+            continue
+        dir_uv = NTH_SET[u_bits, int(door_picks[attempt, 0] * u_count)]
+        v = neighbor_flat[u, dir_uv]
+
+        # Same for x
+        x_bits = cells_flat[x]
+        x_count = POPCOUNT[x_bits]
+        if x_count == 0:
+            continue
+        dir_xy = NTH_SET[x_bits, int(door_picks[attempt, 1] * x_count)]
+        y = neighbor_flat[x, dir_xy]
 
-            # Store valid loop
-            if loop_len > 0:
-                # We must copy the slice to a new array to store it
-                all_loops.append(loop_coords[:loop_len].copy())
+        # Ensure distinct vertices
+        if u == v or u == x or u == y or v == x or v == y or x == y:
+            continue
+
+        # Odd sizes wrap asymmetrically across the column size-1 / 0 seam:
+        # only touch edges whose back-edge leads home, so every swap keeps
+        # the doors symmetric
+        if (neighbor_flat[v, OPP[dir_uv]] != u
+                or neighbor_flat[y, OPP[dir_xy]] != x):
+            continue
 
-    return all_loops
+        v_bits = cells_flat[v]
+
+        # Try pairing (u, x) and (v, y)
+        dir_ux = _direction_numba(neighbor_flat, u, x)
+        dir_vy = _direction_numba(neighbor_flat, v, y)
+        if (dir_ux != -1 and dir_vy != -1
+                and neighbor_flat[x, OPP[dir_ux]] == u
+                and neighbor_flat[y, OPP[dir_vy]] == v
+                and not (u_bits >> dir_ux) & 1 and not (v_bits >> dir_vy) & 1):
+            _swap_edges_numba(cells_flat, u, v, x, y, dir_uv, dir_xy, dir_ux, dir_vy)
+            swaps += 1
+            continue
+
+        # Try pairing (u, y) and (v, x)
+        dir_uy = _direction_numba(neighbor_flat, u, y)
+        dir_vx = _direction_numba(neighbor_flat, v, x)
+        if (dir_uy != -1 and dir_vx != -1
+                and neighbor_flat[y, OPP[dir_uy]] == u
+                and neighbor_flat[x, OPP[dir_vx]] == v
+                and not (u_bits >> dir_uy) & 1 and not (v_bits >> dir_vx) & 1):
+            _swap_edges_numba(cells_flat, u, v, y, x, dir_uv, OPP[dir_xy], dir_uy, dir_vx)
+            swaps += 1
+
+    return swaps
+
+# The signatures compile eagerly, but the first call into any kernel still
+# pays a one-time runtime setup (~10 ms); take it at import, not on the
+# first request
+_find_loops_numba(np.zeros(25, dtype=np.uint8), np.zeros((25, 6), dtype=np.int32), 5)
+
+def _build_neighbor_tables(size):
+    """Precompute all neighbor coordinates for fast lookup
+
+    Returns (neighbor_table, neighbor_flat, neighbor_tuples, rev_dir):
+    - neighbor_table[c, r, dir_idx] -> (nc, nr), shape (size, size, 6, 2)
+    - neighbor_flat[c*size + r, dir_idx] -> nc*size + nr, for the Numba kernels
+    - neighbor_tuples[c][r][dir_idx] -> (nc, nr) as a plain tuple
+    - rev_dir[c][r][(nc, nr)] -> dir_idx, for get_direction
+    """
+    cs, rs = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+
+    # Per-cell (6, 2) direction offsets picked by column parity,
+    # broadcast to (size, size, 6, 2)
+    offsets = np.where((cs % 2 == 0)[:, :, None, None], EVEN_COL_OFFSETS, ODD_COL_OFFSETS)
+    coords = np.stack([cs, rs], axis=-1)[:, :, None, :]
+
+    # Apply wrapping
+    neighbor_table = np.mod(coords + offsets, size).astype(np.int16)
+
+    neighbor_flat = (neighbor_table[..., 0].astype(np.int32) * size
+                     + neighbor_table[..., 1]).reshape(size * size, 6)
+
+    # Pure-Python mirror for scalar lookups, avoiding numpy scalar unboxing.
+    # (Built from one flat tolist(); nested tolist() on the 4-D table is slow.)
+    flat = neighbor_table.reshape(-1).tolist()
+    pairs = list(zip(flat[0::2], flat[1::2]))
+    per_cell = [pairs[i:i + 6] for i in range(0, len(pairs), 6)]
+    neighbor_tuples = [per_cell[c * size:(c + 1) * size] for c in range(size)]
+
+    rev_dir = [[{n: d for d, n in enumerate(cell)} for cell in col]
+               for col in neighbor_tuples]
+
+    # Shared by every grid of this size, so a stray write must fail loudly
+    neighbor_table.setflags(write=False)
+    neighbor_flat.setflags(write=False)
+
+    return neighbor_table, neighbor_flat, neighbor_tuples, rev_dir
+
+# Neighbor tables depend only on size, so they're shared by every grid of
+# that size and survive /reset size flips. Bounded, since the Python
+# mirrors for a 200x200 grid run to tens of MB.
+_NEIGHBOR_TABLE_CACHE = {}
+_NEIGHBOR_TABLE_CACHE_MAX = 8
 
 class HexGrid:
-    def __init__(self, size):
+    def __init__(self, size, seed=None):
         self.size = size
 
-        # Phase 2A: Parallel backend implementation
-        # OLD: Dict-based (Phase 1)
-        self.cells_dict = {} # Key: (col, row), Value: list of doors
-        # NEW: Array-based (Phase 2A) - 6 bits for 6 door directions
-        self.cells_array = np.zeros((size, size), dtype=np.uint8)
-        # Feature flag to switch backends (True = use array backend)
-        # Array backend: ~10-20% slower but ~30% memory savings
-        # Dict backend: Faster for degree-2 graphs, more memory
-        # Keeping dict backend for best performance
-        self._use_array = True
+        # Cell storage is reused across resizes, see _allocate()
+        self._capacity = 0
+        self._allocate(size)
 
         # Precompute neighbor lookup table for performance
-        # Shape: (size, size, 6, 2) -> neighbor coords for each cell and direction
-        self.neighbor_table = np.zeros((size, size, 6, 2), dtype=np.int16)
         self._init_neighbor_table()
 
-        if self._use_array:
-             # Warmup Numba compilation
-             _find_loops_numba(self.cells_array, self.neighbor_table, self.size)
+        # Mutation counter; bumped on every change to cells_array
+        self._version = 0
 
-        # Cache for JSON serialization
-        self._cached_dict = None
-        self._dict_dirty = True
+        self._reset_caches()
+        self._rebuild_key_cache()
+
+        # One PCG64 generator per grid; scramble draws from it in batches.
+        # Pass seed for a reproducible scramble sequence.
+        self._rng = np.random.default_rng(seed)
 
         self.reset_to_organized()
 
+    def _allocate(self, size):
+        """Point cells_array at a view of a grow-only flat buffer
+
+        The buffer is only reallocated when size exceeds every size seen so
+        far, so flipping between sizes doesn't churn the allocator. Slicing
+        a flat buffer keeps the view C-contiguous for the Numba kernels.
+        """
+        num_cells = size * size
+        if size > self._capacity:
+            self._capacity = size
+            self._cells_buf = np.zeros(num_cells, dtype=np.uint8)
+
+        # Cell state: 6 bits per cell, bit d set = door open in direction d
+        self.cells_array = self._cells_buf[:num_cells].reshape(size, size)
+
+    def _reset_caches(self):
+        """Empty every cached view of cells_array"""
+        # Cache for JSON serialization, valid while _version is unchanged
+        self._cached_dict = None
+        self._dict_version = -1
+        # Encoded JSON bytes of to_dict(), valid while _version is unchanged
+        self._cached_cells_json = None
+        self._cells_json_version = -1
+        # Base64 of the packed door masks for /state_v2, same scheme
+        self._cached_cells_b64 = None
+        self._cells_b64_version = -1
+        # Cache for the loop kernel output and find_loops, valid while
+        # _version is unchanged
+        self._cached_loop_arrays = None
+        self._cached_loops = None
+        self._loops_version = -1
+        # Encoded JSON bytes of the loops, valid while _version is unchanged
+        self._cached_loops_json = None
+        self._loops_json_version = -1
+
+    def clone(self):
+        """Independent copy of this grid, sharing only the read-only tables
+
+        Copies the cell buffer and the generator state, so the clone
+        replays the same scramble sequence as the original from here. The
+        caches start empty: to_dict(), find_loops() and friends hand their
+        cached objects to callers, so they can't be shared.
+        """
+        new = object.__new__(HexGrid)
+        new.__dict__.update(self.__dict__)
+        new._cells_buf = self._cells_buf.copy()
+        new.cells_array = new._cells_buf[:self.size * self.size].reshape(self.size, self.size)
+        new._rng = copy.deepcopy(self._rng)
+        new._reset_caches()
+        return new
+
+    def resize(self, size):
+        """Resize the grid in place; call reset_to_organized() after"""
+        self.size = size
+        self._allocate(size)
+        self._init_neighbor_table()
+        self._rebuild_key_cache()
+        self._version += 1
+
+    @property
+    def cells_debug(self):
+        """{(c, r): doors} view of cells_array; O(size^2), for debugging only"""
+        return {(c, r): self._get_cell_doors_raw(c, r) for c, r in self._cell_coords}
+
     @property
     def cells(self):
-        """Backward compatibility property - returns active backend"""
-        return self.cells_dict if not self._use_array else self._build_dict_from_array()
-
-    def _build_dict_from_array(self):
-        """Convert array backend to dict format"""
-        result = {}
-        for c in range(self.size):
-            for r in range(self.size):
-                doors = []
-                for dir_idx in range(6):
-                    if self.cells_array[c, r] & (1 << dir_idx):
-                        doors.append(dir_idx)
-                result[(c, r)] = doors
-        return result
+        """Deprecated alias of cells_debug"""
+        warnings.warn("HexGrid.cells is deprecated and rebuilds a dict of every "
+                      "cell; use cells_array, or cells_debug for inspection",
+                      DeprecationWarning, stacklevel=2)
+        return self.cells_debug
 
-    def reset_to_organized(self, pattern="vertical"):
-        # Reset both backends
-        self.cells_dict = {}
-        self.cells_array.fill(0)
+    def _rebuild_key_cache(self):
+        """Precompute the "c,r" string keys (and coords) used by to_dict.
+
+        Called from __init__ and resize() whenever self.size changes.
+        """
+        self._cell_coords = [(c, r) for c in range(self.size) for r in range(self.size)]
+        self._cell_keys = [f"{c},{r}" for c, r in self._cell_coords]
 
+    def reset_to_organized(self, pattern="vertical"):
+        # Every pattern writes the full array, so no clearing pass first
         if pattern == "vertical":
             self._init_vertical()
         elif pattern == "diagonal_1":
@@ -188,32 +430,23 @@ class HexGrid:
         else:
             self._init_vertical() # Fallback
 
-        self._dict_dirty = True
+        self._version += 1
 
     def _init_vertical(self):
         """Vertical lines (North-South)"""
-        for c in range(self.size):
-            for r in range(self.size):
-                # Vertical connections: 0 (North) and 3 (South)
-                self.cells_dict[(c, r)] = [0, 3]
-                self.cells_array[c, r] = (1 << 0) | (1 << 3)
+        # Vertical connections: 0 (North) and 3 (South)
+        self.cells_array.fill((1 << 0) | (1 << 3))
 
     def _init_diagonal_1(self):
         """Diagonal lines (NE-SW)"""
         # Directions: 1 (NE) and 4 (SW)
-        for c in range(self.size):
-            for r in range(self.size):
-                self.cells_dict[(c, r)] = [1, 4]
-                self.cells_array[c, r] = (1 << 1) | (1 << 4)
+        self.cells_array.fill((1 << 1) | (1 << 4))
 
     def _init_diagonal_2(self):
         """Diagonal lines (NW-SE)"""
         # Directions: 2 (SE) and 5 (NW)
         # Note: "SE" is direction 2, "NW" is direction 5
-        for c in range(self.size):
-            for r in range(self.size):
-                self.cells_dict[(c, r)] = [2, 5]
-                self.cells_array[c, r] = (1 << 2) | (1 << 5)
+        self.cells_array.fill((1 << 2) | (1 << 5))
 
     def _init_concentric(self):
         """Zig-Zag / Waves (Alternating Columns)"""
@@ -222,321 +455,219 @@ class HexGrid:
         # Odd Cols: [2, 4] (SE, SW)
         # Exception: If N is Odd, the last column (N-1, Even) must bridge to Col 0.
         # It uses [2, 5] (SE, NW) to connect N-2(Odd) -> N-1 -> 0(Even).
-        
-        for c in range(self.size):
-            dirs = []
-            if self.size % 2 != 0 and c == self.size - 1:
-                # Last column for Odd N
-                dirs = [2, 5]
-            elif c % 2 == 0:
-                # Even columns
-                dirs = [1, 5]
-            else:
-                # Odd columns
-                dirs = [2, 4]
-                
-            for r in range(self.size):
-                self.cells_dict[(c, r)] = dirs
-                self.cells_array[c, r] = (1 << dirs[0]) | (1 << dirs[1])
+        size = self.size
+        col_mask = np.where(np.arange(size) % 2 == 0,
+                            (1 << 1) | (1 << 5),
+                            (1 << 2) | (1 << 4)).astype(np.uint8)
+        if size % 2 != 0:
+            # Last column for Odd N
+            col_mask[-1] = (1 << 2) | (1 << 5)
+
+        # One mask per column, broadcast down the rows
+        self.cells_array[...] = col_mask[:, None]
 
     def _init_neighbor_table(self):
-        """Precompute all neighbor coordinates for fast lookup"""
-        for c in range(self.size):
-            for r in range(self.size):
-                dirs = EVEN_COL_DIRS if c % 2 == 0 else ODD_COL_DIRS
-                for dir_idx, (dc, dr) in enumerate(dirs):
-                    nc = c + dc
-                    nr = r + dr
-                    # Apply wrapping
-                    wc = ((nc % self.size) + self.size) % self.size
-                    wr = ((nr % self.size) + self.size) % self.size
-                    self.neighbor_table[c, r, dir_idx, 0] = wc
-                    self.neighbor_table[c, r, dir_idx, 1] = wr
+        """Look up the neighbor tables for self.size (built on first use)"""
+        tables = _NEIGHBOR_TABLE_CACHE.get(self.size)
+        if tables is None:
+            tables = _build_neighbor_tables(self.size)
+            if len(_NEIGHBOR_TABLE_CACHE) >= _NEIGHBOR_TABLE_CACHE_MAX:
+                # Evict the oldest size
+                del _NEIGHBOR_TABLE_CACHE[next(iter(_NEIGHBOR_TABLE_CACHE))]
+            _NEIGHBOR_TABLE_CACHE[self.size] = tables
+
+        # Shared between grids of the same size; read-only
+        (self.neighbor_table, self.neighbor_flat,
+         self._neighbor_tuples, self._rev_dir) = tables
+
+    def _wrap(self, c, r):
+        """Wrap coordinates onto the torus (fast exit when already in range)"""
+        size = self.size
+        if 0 <= c < size and 0 <= r < size:
+            return c, r
+        # size > 0, so Python's % already yields a non-negative result
+        return c % size, r % size
+
+    # Public accessors wrap coordinates onto the torus; the _raw variants
+    # skip wrapping for internal callers whose coordinates come from the
+    # sampler or the (pre-wrapped) neighbor table.
 
     def get_cell_doors(self, c, r):
-        if self._use_array:
-            return self._get_cell_doors_array(c, r)
-        wc = ((c % self.size) + self.size) % self.size
-        wr = ((r % self.size) + self.size) % self.size
-        return self.cells_dict.get((wc, wr), [])
-
-    def _get_cell_doors_array(self, c, r):
-        """Array backend: Extract doors from bit flags"""
-        wc = ((c % self.size) + self.size) % self.size
-        wr = ((r % self.size) + self.size) % self.size
-        doors = []
-        bits = self.cells_array[wc, wr]
-        for dir_idx in range(6):
-            if bits & (1 << dir_idx):
-                doors.append(dir_idx)
-        return doors
+        """Extract doors from bit flags"""
+        return self._get_cell_doors_raw(*self._wrap(c, r))
+
+    def _get_cell_doors_raw(self, c, r):
+        return list(DOOR_LISTS[int(self.cells_array[c, r])])
 
     def get_neighbor_coords(self, c, r, dir_idx):
         """Fast neighbor lookup using precomputed table"""
-        return int(self.neighbor_table[c, r, dir_idx, 0]), int(self.neighbor_table[c, r, dir_idx, 1])
+        return self._neighbor_tuples[c][r][dir_idx]
 
     def has_connection(self, c, r, dir_idx):
-        if self._use_array:
-            return self._has_connection_array(c, r, dir_idx)
-        doors = self.get_cell_doors(c, r)
-        return dir_idx in doors
+        """Check bit flag"""
+        wc, wr = self._wrap(c, r)
+        return self._has_connection_raw(wc, wr, dir_idx)
 
-    def _has_connection_array(self, c, r, dir_idx):
-        """Array backend: Check bit flag"""
-        wc = ((c % self.size) + self.size) % self.size
-        wr = ((r % self.size) + self.size) % self.size
-        return bool(self.cells_array[wc, wr] & (1 << dir_idx))
+    def _has_connection_raw(self, c, r, dir_idx):
+        return bool(self.cells_array[c, r] & (1 << dir_idx))
 
     def add_connection(self, c, r, dir_idx):
-        if self._use_array:
-            self._add_connection_array(c, r, dir_idx)
-            return
-
-        doors = self.get_cell_doors(c, r)
-        if dir_idx not in doors:
-            doors.append(dir_idx)
-            # Symmetric
-            nc, nr = self.get_neighbor_coords(c, r, dir_idx)
-            opp_dir = (dir_idx + 3) % 6
-            n_doors = self.get_cell_doors(nc, nr)
-            if opp_dir not in n_doors:
-                n_doors.append(opp_dir)
-            self._dict_dirty = True
-
-    def _add_connection_array(self, c, r, dir_idx):
-        """Array backend: Set bit flags symmetrically"""
-        wc = ((c % self.size) + self.size) % self.size
-        wr = ((r % self.size) + self.size) % self.size
+        """Set bit flags symmetrically"""
+        wc, wr = self._wrap(c, r)
+        self._add_connection_raw(wc, wr, dir_idx)
 
+    def _add_connection_raw(self, c, r, dir_idx):
         # Set bit in current cell
-        self.cells_array[wc, wr] |= (1 << dir_idx)
+        self.cells_array[c, r] |= (1 << dir_idx)
 
         # Symmetric: set bit in neighbor
-        nc, nr = self.get_neighbor_coords(c, r, dir_idx)
+        nc, nr = self._neighbor_tuples[c][r][dir_idx]
         opp_dir = (dir_idx + 3) % 6
         self.cells_array[nc, nr] |= (1 << opp_dir)
 
-        self._dict_dirty = True
+        self._version += 1
 
     def remove_connection(self, c, r, dir_idx):
-        if self._use_array:
-            self._remove_connection_array(c, r, dir_idx)
-            return
-
-        doors = self.get_cell_doors(c, r)
-        if dir_idx in doors:
-            doors.remove(dir_idx)
-            # Symmetric
-            nc, nr = self.get_neighbor_coords(c, r, dir_idx)
-            opp_dir = (dir_idx + 3) % 6
-            n_doors = self.get_cell_doors(nc, nr)
-            if opp_dir in n_doors:
-                n_doors.remove(opp_dir)
-            self._dict_dirty = True
-
-    def _remove_connection_array(self, c, r, dir_idx):
-        """Array backend: Clear bit flags symmetrically"""
-        wc = ((c % self.size) + self.size) % self.size
-        wr = ((r % self.size) + self.size) % self.size
-
-        # Clear bit in current cell using XOR with 0xFF
-        mask = np.uint8(0xFF ^ (1 << dir_idx))
-        self.cells_array[wc, wr] &= mask
+        """Clear bit flags symmetrically"""
+        wc, wr = self._wrap(c, r)
+        self._remove_connection_raw(wc, wr, dir_idx)
+
+    def _remove_connection_raw(self, c, r, dir_idx):
+        # Clear bit in current cell
+        self.cells_array[c, r] &= ~np.uint8(1 << dir_idx)
 
         # Symmetric: clear bit in neighbor
-        nc, nr = self.get_neighbor_coords(c, r, dir_idx)
+        nc, nr = self._neighbor_tuples[c][r][dir_idx]
         opp_dir = (dir_idx + 3) % 6
-        mask_opp = np.uint8(0xFF ^ (1 << opp_dir))
-        self.cells_array[nc, nr] &= mask_opp
+        self.cells_array[nc, nr] &= ~np.uint8(1 << opp_dir)
 
-        self._dict_dirty = True
+        self._version += 1
 
     def get_direction(self, c1, r1, c2, r2):
-        # Check all 6 neighbors of (c1, r1)
-        for i in range(6):
-            nc, nr = self.get_neighbor_coords(c1, r1, i)
-            if nc == c2 and nr == r2:
-                return i
-        return -1
+        """Direction from (c1, r1) to neighbor (c2, r2), or -1 if not adjacent"""
+        return self._rev_dir[c1][r1].get((c2, r2), -1)
 
     def scramble(self, steps=1):
         # Phase 3 optimization: Pre-generate all random numbers with NumPy
         max_attempts = steps * 20
 
-        # Generate batch of random cell coordinates (col, row for cells u and x)
-        # Shape: (max_attempts, 4) = [uc, ur, xc, xr] for each attempt
-        random_cells = np.random.randint(0, self.size, size=(max_attempts, 4), dtype=np.int16)
-
-        # Generate random direction indices (for selecting which door to use)
-        # Shape: (max_attempts, 2) = [dir_idx_u, dir_idx_x] for each attempt
-        random_dir_indices = np.random.randint(0, 2, size=(max_attempts, 2), dtype=np.uint8)
-
-        swaps = 0
-        for attempt in range(max_attempts):
-            if swaps >= steps:
-                break
-            if self.perform_swap_vectorized(random_cells[attempt], random_dir_indices[attempt]):
-                swaps += 1
-        return swaps
-
-    def perform_swap_vectorized(self, cell_coords, dir_indices):
-        """Vectorized swap using pre-generated random numbers"""
-        # Unpack pre-generated random coordinates (convert to Python int for speed)
-        uc = int(cell_coords[0])
-        ur = int(cell_coords[1])
-        xc = int(cell_coords[2])
-        xr = int(cell_coords[3])
+        # Generate batch of random cell ids (c*size + r for cells u and x)
+        # Shape: (max_attempts, 2) = [u, x] for each attempt
+        num_cells = self.size * self.size
+        random_cells = self._rng.integers(0, num_cells, size=(max_attempts, 2), dtype=np.int32)
 
-        u_doors = self.get_cell_doors(uc, ur)
-        if not u_doors: return False
+        # Generate uniform [0, 1) picks for selecting which door to use
+        # Shape: (max_attempts, 2) = [pick_u, pick_x] for each attempt
+        door_picks = self._rng.random((max_attempts, 2))
 
-        # Use pre-generated random index to select door (modulo to handle varying door counts)
-        dir_uv = u_doors[int(dir_indices[0]) % len(u_doors)]
-        vc, vr = self.get_neighbor_coords(uc, ur, dir_uv)
+        # Call Numba-optimized swap loop (mutates cells_array in place
+        # through its flat view)
+        swaps = _scramble_numba(self.cells_array.ravel(), self.neighbor_flat,
+                                random_cells, door_picks, steps)
 
-        x_doors = self.get_cell_doors(xc, xr)
-        if not x_doors: return False
-
-        # Use pre-generated random index to select door
-        dir_xy = x_doors[int(dir_indices[1]) % len(x_doors)]
-        yc, yr = self.get_neighbor_coords(xc, xr, dir_xy)
-        
-        # Ensure distinct vertices
-        u = (uc, ur)
-        v = (vc, vr)
-        x = (xc, xr)
-        y = (yc, yr)
-        
-        if len({u, v, x, y}) < 4:
-            return False
-
-        # Try pairing (u, x) and (v, y)
-        dir_ux = self.get_direction(uc, ur, xc, xr)
-        dir_vy = self.get_direction(vc, vr, yc, yr)
-        
-        if dir_ux != -1 and dir_vy != -1:
-            if not self.has_connection(uc, ur, dir_ux) and not self.has_connection(vc, vr, dir_vy):
-                self.remove_connection(uc, ur, dir_uv)
-                self.remove_connection(xc, xr, dir_xy)
-                self.add_connection(uc, ur, dir_ux)
-                self.add_connection(vc, vr, dir_vy)
-                return True
+        if swaps:
+            self._version += 1
+        return swaps
 
-        # Try pairing (u, y) and (v, x)
-        dir_uy = self.get_direction(uc, ur, yc, yr)
-        dir_vx = self.get_direction(vc, vr, xc, xr)
-        
-        if dir_uy != -1 and dir_vx != -1:
-            if not self.has_connection(uc, ur, dir_uy) and not self.has_connection(vc, vr, dir_vx):
-                self.remove_connection(uc, ur, dir_uv)
-                self.remove_connection(xc, xr, dir_xy)
-                self.add_connection(uc, ur, dir_uy)
-                self.add_connection(vc, vr, dir_vx)
-                return True
-                
-        return False
-    
-    def find_loops(self):
-        if self._use_array:
-            # Call Numba-optimized function
-            loops_numba = _find_loops_numba(
-                self.cells_array,
-                self.neighbor_table,
+    def _loop_arrays(self):
+        """Raw (coords, lengths) from the loop kernel, cached until the grid is next mutated"""
+        if self._loops_version != self._version:
+            self._cached_loop_arrays = _find_loops_numba(
+                self.cells_array.ravel(),
+                self.neighbor_flat,
                 self.size
             )
+            self._cached_loops = None
+            self._loops_version = self._version
+        return self._cached_loop_arrays
 
-            # Convert to JSON-compatible format
-            loops = []
-            for loop_coords in loops_numba:
-                loop = [{"q": int(loop_coords[i, 0]), "r": int(loop_coords[i, 1])}
-                        for i in range(len(loop_coords))]
-                loops.append(loop)
-            return loops
-
-        # Phase 3 optimization: NumPy boolean array for O(1) visited checks
-        visited = np.zeros((self.size, self.size), dtype=bool)
+    def find_loops(self):
+        """Find all loops as lists of {"q", "r"} dicts (built on demand and cached)"""
+        coords, lengths = self._loop_arrays()
+        if self._cached_loops is not None:
+            return self._cached_loops
+
+        # Convert to JSON-compatible format, unboxing the coords once with
+        # tolist() rather than converting numpy scalars per cell
+        coord_list = coords.tolist()
         loops = []
+        start = 0
+        for length in lengths.tolist():
+            end = start + length
+            loops.append([{"q": c, "r": r} for c, r in coord_list[start:end]])
+            start = end
 
-        # Pre-allocate loop storage (worst case: all cells in one loop)
-        max_loop_size = self.size * self.size
-        loop_coords = np.zeros((max_loop_size, 2), dtype=np.int16)
-
-        for c in range(self.size):
-            for r in range(self.size):
-                if visited[c, r]:
-                    continue
-
-                loop_idx = 0
-                curr_c, curr_r = c, r
-                prev_c, prev_r = -1, -1
-
-                while True:
-                    # Check if already visited (except for starting cell on first iteration)
-                    if visited[curr_c, curr_r]:
-                        if curr_c == c and curr_r == r and loop_idx > 0:
-                            break  # Completed the loop
-                        else:
-                            break  # Hit another loop
-
-                    visited[curr_c, curr_r] = True
-                    loop_coords[loop_idx, 0] = curr_c
-                    loop_coords[loop_idx, 1] = curr_r
-                    loop_idx += 1
-
-                    doors = self.get_cell_doors(curr_c, curr_r)
-                    if not doors: break
-
-                    next_dir = doors[0]
-                    nc, nr = self.get_neighbor_coords(curr_c, curr_r, next_dir)
-
-                    # Avoid backtracking
-                    if prev_c != -1 and nc == prev_c and nr == prev_r:
-                        if len(doors) > 1:
-                            next_dir = doors[1]
-                            nc, nr = self.get_neighbor_coords(curr_c, curr_r, next_dir)
-                        else:
-                            break
-
-                    prev_c, prev_r = curr_c, curr_r
-                    curr_c, curr_r = nc, nr
-
-                # Convert to list format for JSON compatibility
-                if loop_idx > 0:
-                    loop = [{"q": int(loop_coords[i, 0]), "r": int(loop_coords[i, 1])}
-                            for i in range(loop_idx)]
-                    loops.append(loop)
-
+        self._cached_loops = loops
         return loops
 
+    def loops_json(self):
+        """Loops encoded as JSON [[[c, r], ...], ...], cached by mutation version
+
+        orjson serializes the kernel's coordinate slices directly, so no
+        per-cell dicts are built.
+        """
+        if self._loops_json_version != self._version:
+            coords, lengths = self._loop_arrays()
+            if len(lengths):
+                loops = np.split(coords, np.cumsum(lengths)[:-1])
+            else:
+                loops = []
+            self._cached_loops_json = orjson.dumps(loops, option=orjson.OPT_SERIALIZE_NUMPY)
+            self._loops_json_version = self._version
+        return self._cached_loops_json
+
+    def cells_json(self):
+        """to_dict() encoded as JSON bytes, cached by mutation version"""
+        if self._cells_json_version != self._version:
+            self._cached_cells_json = orjson.dumps(self.to_dict())
+            self._cells_json_version = self._version
+        return self._cached_cells_json
+
+    def cells_bits_b64(self):
+        """cells_array as base64 (one door mask byte per cell, id c*size + r), cached by mutation version"""
+        if self._cells_b64_version != self._version:
+            self._cached_cells_b64 = base64.b64encode(self.cells_array.tobytes())
+            self._cells_b64_version = self._version
+        return self._cached_cells_b64
+
     def to_dict(self):
         """Convert grid to dict format with caching"""
-        if not self._dict_dirty and self._cached_dict is not None:
+        if self._dict_version == self._version:
             return self._cached_dict
 
-        if self._use_array:
-            # Phase 3 optimization: Vectorized bit extraction with NumPy broadcasting
-            # Create mask for each direction: shape (6, 1, 1) for broadcasting
-            dir_masks = np.array([1 << i for i in range(6)], dtype=np.uint8)[:, None, None]
-
-            # Broadcasting: (6, size, size) & (6, 1, 1) -> (6, size, size)
-            # has_door[dir, c, r] = True if cell (c,r) has door in direction dir
-            has_door = (self.cells_array[None, :, :] & dir_masks) != 0
-
-            # Build dict with vectorized door extraction
-            self._cached_dict = {}
-            for c in range(self.size):
-                for r in range(self.size):
-                    # Extract doors for this cell using boolean indexing
-                    doors = np.where(has_door[:, c, r])[0].tolist()
-                    self._cached_dict[f"{c},{r}"] = {"q": c, "r": r, "doors": doors}
-        else:
-            # Build from dict backend (already optimal)
-            self._cached_dict = {f"{k[0]},{k[1]}": {"q": k[0], "r": k[1], "doors": v}
-                                 for k, v in self.cells_dict.items()}
+        # Unbox the flattened grid (row-major: c*size + r) once, then unpack
+        # each 6-bit mask through DOOR_LISTS, which holds all 64 possible
+        # unpackings. Faster than np.nonzero + splitting per cell boundary.
+        bits = self.cells_array.ravel().tolist()
 
-        self._dict_dirty = False
+        self._cached_dict = {}
+        for key, (c, r), cell_bits in zip(self._cell_keys, self._cell_coords, bits):
+            self._cached_dict[key] = {"q": c, "r": r, "doors": list(DOOR_LISTS[cell_bits])}
+
+        self._dict_version = self._version
         return self._cached_dict
 
+def _state_response(grid, swaps=None, packed=False):
+    """JSON response with the grid's cells, loops and size (and swaps, if given)
+
+    The cells and loops are spliced in from cached encoded bytes, so an
+    unchanged grid costs a byte copy rather than a dict rebuild + re-encode.
+    Loops are sent as [c, r] pairs; script.js maps them back to {q, r}.
+
+    With packed=True the cells go out as "cells_bits": base64 of one door
+    mask byte per cell in c*size + r order, instead of the "cells" dict.
+    """
+    parts = [b'{']
+    if swaps is not None:
+        parts += [b'"swaps":', str(swaps).encode(), b',']
+    if packed:
+        parts += [b'"cells_bits":"', grid.cells_bits_b64(), b'"']
+    else:
+        parts += [b'"cells":', grid.cells_json()]
+    parts += [b',"loops":', grid.loops_json(),
+              b',"size":', str(grid.size).encode(), b'}']
+    return Response(b''.join(parts), mimetype='application/json')
+
 grid = HexGrid(GRID_SIZE)
 
 @app.route('/')
@@ -545,23 +676,20 @@ def index():
 
 @app.route('/state')
 def get_state():
-    return jsonify({
-        "cells": grid.to_dict(),
-        "loops": grid.find_loops(),
-        "size": grid.size
-    })
+    """Deprecated: full {"c,r": {q, r, doors}} cells dict; use /state_v2"""
+    return _state_response(grid)
+
+@app.route('/state_v2')
+def get_state_v2():
+    """Current state with cells packed as base64 door masks"""
+    return _state_response(grid, packed=True)
 
 @app.route('/scramble', methods=['POST'])
 def scramble():
     data = request.json
     steps = data.get('steps', 1)
     swaps = grid.scramble(steps)
-    return jsonify({
-        "swaps": swaps, 
-        "cells": grid.to_dict(),
-        "loops": grid.find_loops(),
-        "size": grid.size
-    })
+    return _state_response(grid, swaps=swaps, packed=bool(data.get('packed')))
 
 @app.route('/reset', methods=['POST'])
 def reset():
@@ -572,22 +700,14 @@ def reset():
         try:
             new_size = int(new_size)
             # Clamp size to safe limits
-            new_size = max(5, min(200, new_size))
+            new_size = max(MIN_GRID_SIZE, min(MAX_GRID_SIZE, new_size))
             if new_size != grid.size:
-                grid.size = new_size
-                # Reinitialize arrays for new size
-                grid.neighbor_table = np.zeros((new_size, new_size, 6, 2), dtype=np.int16)
-                grid.cells_array = np.zeros((new_size, new_size), dtype=np.uint8)
-                grid._init_neighbor_table()
+                grid.resize(new_size)
         except ValueError:
             pass # Keep current size if invalid
             
     grid.reset_to_organized(pattern=data.get('pattern', 'vertical'))
-    return jsonify({
-        "cells": grid.to_dict(),
-        "loops": grid.find_loops(),
-        "size": grid.size
-    })
+    return _state_response(grid, packed=bool(data.get('packed')))
 
 if __name__ == '__main__':
     app.run(port=3000, debug=True)
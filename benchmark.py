@@ -1,68 +1,85 @@
 """
 Benchmark script to test performance improvements
 
-Run this to compare performance at different grid sizes.
+Run this to compare performance at different grid sizes. Sizes run one
+at a time for stable timings; pass --parallel for a quicker, noisier run.
 """
-import time
+import io
 import sys
+from contextlib import redirect_stdout
 sys.path.insert(0, '.')
 
-from app import HexGrid
+from _grid_probe import capture, map_sizes, proto_grid, timed
 
 def benchmark_grid(size, scramble_steps):
-    """Benchmark a single grid size"""
-    print(f"\n{'='*60}")
-    print(f"Benchmarking N={size} (Total cells: {size*size})")
-    print(f"{'='*60}")
+    """Benchmark a single grid size
 
-    # Initialize grid
-    start = time.perf_counter()
-    grid = HexGrid(size)
-    init_time = time.perf_counter() - start
-    print(f"  Init time: {init_time*1000:.2f} ms")
+    All timed sections run back to back; the report is printed afterwards
+    in one write, so stdout I/O never lands between or inside them.
+    """
+    # Initialize grid (built once per size, then cloned)
+    proto, init_ns = timed(proto_grid, size)
+    grid, clone_ns = timed(proto.clone)
 
     # Test scramble performance
-    start = time.perf_counter()
-    swaps = grid.scramble(scramble_steps)
-    scramble_time = time.perf_counter() - start
-    print(f"  Scramble ({scramble_steps} steps): {scramble_time*1000:.2f} ms")
-    print(f"    Successful swaps: {swaps}")
-    print(f"    Time per swap: {scramble_time*1000/swaps if swaps > 0 else 0:.3f} ms")
+    swaps, scramble_ns = timed(grid.scramble, scramble_steps)
 
     # Test loop finding
-    start = time.perf_counter()
-    loops = grid.find_loops()
-    loop_time = time.perf_counter() - start
-    print(f"  Loop finding: {loop_time*1000:.2f} ms")
-    print(f"    Loops found: {len(loops)}")
-
-    # Test serialization
-    start = time.perf_counter()
-    data = grid.to_dict()
-    serialize_time = time.perf_counter() - start
-    print(f"  Serialization (first): {serialize_time*1000:.2f} ms")
-
-    # Test cached serialization
-    start = time.perf_counter()
-    data = grid.to_dict()
-    cached_time = time.perf_counter() - start
-    print(f"  Serialization (cached): {cached_time*1000:.2f} ms")
-    print(f"    Cache speedup: {serialize_time/cached_time if cached_time > 0 else 'inf'}x")
-
-    # Total time
-    total_time = scramble_time + loop_time + serialize_time
-    print(f"\n  TOTAL REQUEST TIME: {total_time*1000:.2f} ms")
+    loops, loop_ns = timed(grid.find_loops)
+
+    # Test serialization: the encoded cells bytes the routes send, first
+    # after the scramble (dict build + encode), then from the cache
+    _, serialize_ns = timed(grid.cells_json)
+    _, cached_ns = timed(grid.cells_json)
+
+    # Total time: a /scramble request pays the uncached serialization once;
+    # repeat reads of the unchanged grid pay only the cached lookup.
+    # Everything stays in integer nanoseconds until it's formatted.
+    total_ns = scramble_ns + loop_ns + serialize_ns
+
+    log = [
+        f"\n{'='*60}",
+        f"Benchmarking N={size} (Total cells: {size*size})",
+        f"{'='*60}",
+        f"  Init time: {init_ns/1e6:.2f} ms",
+        f"  Clone time: {clone_ns/1e6:.2f} ms",
+        f"  Scramble ({scramble_steps} steps): {scramble_ns/1e6:.2f} ms",
+        f"    Successful swaps: {swaps}",
+        f"    Time per swap: {scramble_ns/1e6/swaps if swaps > 0 else 0:.3f} ms",
+        f"  Loop finding: {loop_ns/1e6:.2f} ms",
+        f"    Loops found: {len(loops)}",
+        f"  Serialization (after mutation): {serialize_ns/1e6:.2f} ms",
+        f"  Serialization (cached): {cached_ns/1e6:.3f} ms ({cached_ns} ns)",
+        f"    Cache speedup: {serialize_ns/cached_ns if cached_ns > 0 else 'inf'}x",
+        f"\n  TOTAL REQUEST TIME: {total_ns/1e6:.2f} ms",
+        f"  Repeat read (cached): {cached_ns/1e6:.3f} ms",
+    ]
+    print("\n".join(log))
 
     return {
         'size': size,
-        'scramble_ms': scramble_time * 1000,
-        'loop_find_ms': loop_time * 1000,
-        'serialize_ms': serialize_time * 1000,
-        'total_ms': total_time * 1000
+        'scramble_ms': scramble_ns / 1e6,
+        'loop_find_ms': loop_ns / 1e6,
+        'serialize_ms': serialize_ns / 1e6,
+        'cached_ms': cached_ns / 1e6,
+        'total_ms': total_ns / 1e6
     }
 
-def main():
-    """Run benchmarks for various grid sizes"""
+def _benchmark_task(size):
+    """Benchmark one size in a worker process; returns (result or None, output)"""
+    steps = max(5, size // 2)  # Same as production
+    try:
+        return capture(benchmark_grid, size, steps)
+    except Exception as e:
+        return None, f"\n  ERROR at N={size}: {e}\n"
+
+def main(parallel=False):
+    """Run benchmarks for various grid sizes
+
+    Sizes run one after another by default: run side by side they compete
+    for cores and memory bandwidth and skew each other's timings.
+    parallel=True (--parallel) trades that accuracy for a faster run.
+    """
     print("\n" + "="*60)
     print("BABEL SIMULATION PERFORMANCE BENCHMARK")
     print("Phase 1: Neighbor table + JSON caching")
@@ -72,46 +89,52 @@ def main():
     sizes = [10, 25, 50, 75, 100, 125, 150]
     results = []
 
-    for size in sizes:
-        steps = max(5, size // 2)  # Same as production
-        try:
-            result = benchmark_grid(size, steps)
-            results.append(result)
-        except Exception as e:
-            print(f"\n  ERROR at N={size}: {e}")
-            break
-
-    # Summary table
-    print("\n" + "="*60)
-    print("SUMMARY")
-    print("="*60)
-    print(f"{'N':<6} {'Cells':<8} {'Scramble':<12} {'Loops':<12} {'Total':<12}")
-    print("-"*60)
-    for r in results:
-        cells = r['size'] ** 2
-        print(f"{r['size']:<6} {cells:<8} {r['scramble_ms']:>10.1f}ms {r['loop_find_ms']:>10.1f}ms {r['total_ms']:>10.1f}ms")
+    # Reported in size order either way
+    if parallel:
+        outcomes = map_sizes(_benchmark_task, sizes)
+    else:
+        outcomes = map(_benchmark_task, sizes)
 
-    print("\n" + "="*60)
-    print("ANALYSIS")
-    print("="*60)
-    if len(results) >= 2:
-        n10 = next((r for r in results if r['size'] == 10), None)
-        n100 = next((r for r in results if r['size'] == 100), None)
-
-        if n10 and n100:
-            scaling = n100['total_ms'] / n10['total_ms']
-            theoretical = (100/10)**2  # O(N²) would be 100x
-            print(f"  N=10 → N=100 scaling: {scaling:.1f}x")
-            print(f"  Theoretical O(N²): {theoretical:.1f}x")
-            print(f"  Performance: {'EXCELLENT' if scaling < theoretical * 0.5 else 'GOOD' if scaling < theoretical else 'NEEDS WORK'}")
-
-        largest = results[-1]
-        if largest['total_ms'] < 100:
-            print(f"\n  ✓ N={largest['size']} runs at {1000/largest['total_ms']:.0f} FPS - REAL-TIME!")
-        elif largest['total_ms'] < 500:
-            print(f"\n  ✓ N={largest['size']} runs at {1000/largest['total_ms']:.1f} FPS - Smooth")
-        else:
-            print(f"\n  ⚠ N={largest['size']} at {largest['total_ms']:.0f}ms - Consider Phase 2 optimizations")
+    for result, output in outcomes:
+        print(output, end='')
+        if result is None:
+            break
+        results.append(result)
+
+    # Summary table and analysis, collected and written out in one go
+    report = io.StringIO()
+    with redirect_stdout(report):
+        print("\n" + "="*60)
+        print("SUMMARY")
+        print("="*60)
+        print(f"{'N':<6} {'Cells':<8} {'Scramble':<12} {'Loops':<12} {'Total':<12}")
+        print("-"*60)
+        for r in results:
+            cells = r['size'] ** 2
+            print(f"{r['size']:<6} {cells:<8} {r['scramble_ms']:>10.1f}ms {r['loop_find_ms']:>10.1f}ms {r['total_ms']:>10.1f}ms")
+
+        print("\n" + "="*60)
+        print("ANALYSIS")
+        print("="*60)
+        if len(results) >= 2:
+            n10 = next((r for r in results if r['size'] == 10), None)
+            n100 = next((r for r in results if r['size'] == 100), None)
+
+            if n10 and n100:
+                scaling = n100['total_ms'] / n10['total_ms']
+                theoretical = (100/10)**2  # O(N²) would be 100x
+                print(f"  N=10 → N=100 scaling: {scaling:.1f}x")
+                print(f"  Theoretical O(N²): {theoretical:.1f}x")
+                print(f"  Performance: {'EXCELLENT' if scaling < theoretical * 0.5 else 'GOOD' if scaling < theoretical else 'NEEDS WORK'}")
+
+            largest = results[-1]
+            if largest['total_ms'] < 100:
+                print(f"\n  ✓ N={largest['size']} runs at {1000/largest['total_ms']:.0f} FPS - REAL-TIME!")
+            elif largest['total_ms'] < 500:
+                print(f"\n  ✓ N={largest['size']} runs at {1000/largest['total_ms']:.1f} FPS - Smooth")
+            else:
+                print(f"\n  ⚠ N={largest['size']} at {largest['total_ms']:.0f}ms - Consider Phase 2 optimizations")
+    sys.stdout.write(report.getvalue())
 
 if __name__ == '__main__':
-    main()
+    main(parallel='--parallel' in sys.argv[1:])
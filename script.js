@@ -259,9 +259,9 @@ document.getElementById('btnReset').addEventListener('click', async () => {
     const response = await fetch('/reset', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ size: size, pattern: pattern })
+        body: JSON.stringify({ size: size, pattern: pattern, packed: true })
     });
-    const data = await response.json();
+    const data = await readState(response);
     renderer.draw(data);
 });
 
@@ -284,9 +284,9 @@ document.getElementById('rngSize').addEventListener('change', async (e) => {
     const response = await fetch('/reset', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ size: size, pattern: pattern })
+        body: JSON.stringify({ size: size, pattern: pattern, packed: true })
     });
-    const data = await response.json();
+    const data = await readState(response);
     renderer.draw(data);
 });
 
@@ -632,9 +632,38 @@ class TimeSeriesChart {
 const histogram = new Histogram(document.getElementById('histogramCanvas'));
 const timeSeriesChart = new TimeSeriesChart(document.getElementById('timeseriesCanvas'));
 
-async function fetchState() {
-    const response = await fetch('/state');
+// Unpack /state_v2 "cells_bits" (base64, one door mask byte per cell in
+// c*size + r order) into the {"c,r": {q, r, doors}} map the renderer uses.
+function decodeCellsBits(cellsBits, size) {
+    const bytes = atob(cellsBits);
+    const cells = {};
+    for (let c = 0; c < size; c++) {
+        for (let r = 0; r < size; r++) {
+            const bits = bytes.charCodeAt(c * size + r);
+            const doors = [];
+            for (let d = 0; d < 6; d++) {
+                if (bits & (1 << d)) doors.push(d);
+            }
+            cells[`${c},${r}`] = { q: c, r: r, doors: doors };
+        }
+    }
+    return cells;
+}
+
+// Parse a state response. The server sends each loop as [[c, r], ...];
+// map the pairs back to the {q, r} cells the renderer and charts use.
+async function readState(response) {
     const data = await response.json();
+    if (data.cells_bits !== undefined) {
+        data.cells = decodeCellsBits(data.cells_bits, data.size);
+    }
+    data.loops = data.loops.map(loop => loop.map(([q, r]) => ({ q, r })));
+    return data;
+}
+
+async function fetchState() {
+    const response = await fetch('/state_v2');
+    const data = await readState(response);
     renderer.draw(data);
     // Update slider to match backend state
     document.getElementById('rngSize').value = data.size;
@@ -661,14 +690,14 @@ async function scrambleStep() {
         const response = await fetch('/scramble', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ steps: steps }),
+            body: JSON.stringify({ steps: steps, packed: true }),
             signal: controller.signal
         });
         clearTimeout(timeoutId);
 
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
 
-        const data = await response.json();
+        const data = await readState(response);
         renderer.draw(data);
 
         // Update timeseries with longest path
@@ -715,9 +744,9 @@ document.getElementById('btnReset').addEventListener('click', async () => {
     const response = await fetch('/reset', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ size: size, pattern: pattern })
+        body: JSON.stringify({ size: size, pattern: pattern, packed: true })
     });
-    const data = await response.json();
+    const data = await readState(response);
     renderer.draw(data);
     histogram.setGridSize(data.size);
     histogram.reset();
@@ -745,9 +774,9 @@ document.getElementById('rngSize').addEventListener('change', async (e) => {
     const response = await fetch('/reset', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ size: size, pattern: pattern })
+        body: JSON.stringify({ size: size, pattern: pattern, packed: true })
     });
-    const data = await response.json();
+    const data = await readState(response);
     renderer.draw(data);
     histogram.setGridSize(data.size);
     histogram.reset();
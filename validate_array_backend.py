@@ -1,192 +1,215 @@
 """
-Validation script for Phase 2A array backend implementation
+Validation script for the array backend
 
-This script tests that the dict backend and array backend produce identical results.
+The dict backend has been removed, so this script checks the array backend
+against its invariants and against plain-Python reference implementations
+of door extraction and loop finding.
 """
 import sys
 sys.path.insert(0, '.')
 
 from app import HexGrid
+from _grid_probe import capture, map_sizes, neighbor_lut, probe_invariants, probe_loops
 import numpy as np
 
+def _reference_loops(g):
+    """Pure-Python loop traversal (the former dict-backend find_loops)"""
+    size = g.size
+    # Flat visited bitmap indexed by c*size + r
+    visited = bytearray(size * size)
+    loops = []
+
+    for c in range(size):
+        for r in range(size):
+            if visited[c * size + r]:
+                continue
+
+            loop = []
+            curr_c, curr_r = c, r
+            prev_c, prev_r = -1, -1
+
+            while not visited[curr_c * size + curr_r]:
+                visited[curr_c * size + curr_r] = 1
+                loop.append((curr_c, curr_r))
+
+                doors = g.get_cell_doors(curr_c, curr_r)
+                if not doors:
+                    loop = []
+                    break
+
+                nc, nr = g.get_neighbor_coords(curr_c, curr_r, doors[0])
+                # Avoid backtracking
+                if nc == prev_c and nr == prev_r:
+                    if len(doors) < 2:
+                        loop = []
+                        break
+                    nc, nr = g.get_neighbor_coords(curr_c, curr_r, doors[1])
+
+                prev_c, prev_r = curr_c, curr_r
+                curr_c, curr_r = nc, nr
+
+            # Only keep walks that closed back on their start cell
+            if loop and curr_c == c and curr_r == r:
+                loops.append(loop)
+
+    return loops
+
 def validate_backend_equivalence(size=10, scramble_steps=5):
-    """Test that dict and array backends produce identical results"""
+    """Test the array backend against reference implementations"""
     print(f"\n{'='*60}")
-    print(f"Validating backend equivalence at N={size}")
+    print(f"Validating array backend at N={size}")
     print(f"{'='*60}")
 
-    # Create two grids with same random seed
-    grid_dict = HexGrid(size)
-    grid_dict._use_array = False
-
-    grid_array = HexGrid(size)
-    grid_array._use_array = True
+    # Seeded so the scramble (and so every later check) is reproducible
+    grid = HexGrid(size, seed=42)
 
     # Test 1: Initial organized state
     print("\n[1] Testing initial organized state...")
-    dict_state = grid_dict.to_dict()
-    array_state = grid_array.to_dict()
+    # Every cell open North (0) and South (3)
+    expected_mask = np.full((size, size), (1 << 0) | (1 << 3), dtype=np.uint8)
 
-    if dict_state == array_state:
-        print("  ✓ Initial states match")
+    if np.array_equal(grid.cells_array, expected_mask):
+        print("  ✓ Initial state matches vertical pattern")
     else:
-        print("  ✗ FAIL: Initial states differ!")
+        print("  ✗ FAIL: Initial state differs from vertical pattern!")
         return False
 
-    # Test 2: Scrambling with same random operations
+    # Test 2: Scrambling, then door extraction on random cells
     print(f"\n[2] Testing scramble ({scramble_steps} steps)...")
 
-    # Manually perform same swaps on both grids
-    import random
-    random.seed(42)
-
-    for step in range(scramble_steps):
-        # Generate same random choices for both
-        uc = random.randint(0, size - 1)
-        ur = random.randint(0, size - 1)
-
-        # Perform swap on dict grid
-        grid_dict._use_array = False
-        u_doors_dict = grid_dict.get_cell_doors(uc, ur)
-
-        # Perform same on array grid
-        grid_array._use_array = True
-        u_doors_array = grid_array.get_cell_doors(uc, ur)
+    grid.scramble(scramble_steps)
+    state = grid.to_dict()
+
+    # All probe cells in one batched draw
+    rng = np.random.default_rng(42)
+    ucs, urs = rng.integers(0, size, (2, scramble_steps))
+
+    # Door masks of every probe cell: the raw bits, and rebuilt from the
+    # get_cell_doors and to_dict door lists
+    probes = list(zip(ucs.tolist(), urs.tolist()))
+    raw_masks = grid.cells_array[ucs, urs]
+    doors_masks = np.array([sum(1 << d for d in grid.get_cell_doors(c, r))
+                            for c, r in probes], dtype=np.uint8)
+    dict_masks = np.array([sum(1 << d for d in state[f"{c},{r}"]["doors"])
+                           for c, r in probes], dtype=np.uint8)
+
+    if not (np.array_equal(doors_masks, raw_masks) and np.array_equal(dict_masks, raw_masks)):
+        step = int(np.flatnonzero((doors_masks != raw_masks) | (dict_masks != raw_masks))[0])
+        uc, ur = probes[step]
+        print(f"  ✗ FAIL: Doors differ at step {step} for cell ({uc}, {ur})")
+        print(f"    get_cell_doors: {grid.get_cell_doors(uc, ur)}")
+        print(f"    to_dict: {state[f'{uc},{ur}']['doors']}")
+        return False
 
-        if u_doors_dict != u_doors_array:
-            print(f"  ✗ FAIL: Doors differ at step {step} for cell ({uc}, {ur})")
-            print(f"    Dict: {u_doors_dict}")
-            print(f"    Array: {u_doors_array}")
-            return False
+    print("  ✓ Get cell doors matches to_dict for all random cells")
 
-    print("  ✓ Get cell doors matches for all random cells")
+    deg, missing = probe_invariants(grid)
 
     # Test 3: Validate degree-2 constraint
     print("\n[3] Validating degree-2 constraint...")
 
-    for backend_name, g in [("dict", grid_dict), ("array", grid_array)]:
-        g._use_array = (backend_name == "array")
-        violations = []
-
-        for c in range(size):
-            for r in range(size):
-                doors = g.get_cell_doors(c, r)
-                if len(doors) != 2:
-                    violations.append((c, r, len(doors)))
-
-        if violations:
-            print(f"  ✗ FAIL ({backend_name}): Degree-2 violations at {len(violations)} cells")
-            for c, r, deg in violations[:5]:
-                print(f"    Cell ({c}, {r}) has degree {deg}")
-            return False
+    violations = np.argwhere(deg != 2)
+    if len(violations):
+        print(f"  ✗ FAIL: Degree-2 violations at {len(violations)} cells")
+        for c, r in violations[:5]:
+            print(f"    Cell ({c}, {r}) has degree {deg[c, r]}")
+        return False
 
-    print("  ✓ All cells have exactly 2 doors (both backends)")
+    print("  ✓ All cells have exactly 2 doors")
 
     # Test 4: Validate symmetry
     print("\n[4] Validating connection symmetry...")
 
-    for backend_name, g in [("dict", grid_dict), ("array", grid_array)]:
-        g._use_array = (backend_name == "array")
-        asymmetric = []
-
-        for c in range(size):
-            for r in range(size):
-                doors = g.get_cell_doors(c, r)
-                for dir_idx in doors:
-                    # Check if neighbor has opposite connection
-                    nc, nr = g.get_neighbor_coords(c, r, dir_idx)
-                    opp_dir = (dir_idx + 3) % 6
-                    if not g.has_connection(nc, nr, opp_dir):
-                        asymmetric.append(((c, r), dir_idx, (nc, nr), opp_dir))
-
-        if asymmetric:
-            print(f"  ✗ FAIL ({backend_name}): Asymmetric connections found")
-            for (c1, r1), d1, (c2, r2), d2 in asymmetric[:3]:
-                print(f"    ({c1},{r1})->{d1} but ({c2},{r2}) missing {d2}")
-            return False
+    asymmetric = np.argwhere(missing)
+    if len(asymmetric):
+        print("  ✗ FAIL: Asymmetric connections found")
+        for c, r, d in asymmetric[:3]:
+            nc, nr = neighbor_lut(size)[c, r, d]
+            print(f"    ({c},{r})->{d} but ({nc},{nr}) missing {(d + 3) % 6}")
+        return False
 
-    print("  ✓ All connections are symmetric (both backends)")
+    print("  ✓ All connections are symmetric")
 
     # Test 5: Loop finding
     print("\n[5] Testing loop finding...")
 
-    grid_dict._use_array = False
-    loops_dict = grid_dict.find_loops()
+    loops_ref = _reference_loops(grid)
+    loops_array = grid.find_loops()
 
-    grid_array._use_array = True
-    loops_array = grid_array.find_loops()
+    # Loop lengths, one C-level pass per side
+    ref_lens = probe_loops(loops_ref)
+    array_lens = probe_loops(loops_array)
 
-    if len(loops_dict) != len(loops_array):
+    if ref_lens.size != array_lens.size:
         print(f"  ✗ FAIL: Different number of loops")
-        print(f"    Dict: {len(loops_dict)} loops")
-        print(f"    Array: {len(loops_array)} loops")
+        print(f"    Reference: {ref_lens.size} loops")
+        print(f"    Numba: {array_lens.size} loops")
         return False
 
-    # Sort loops by length for comparison
-    loops_dict_sorted = sorted([len(loop) for loop in loops_dict])
-    loops_array_sorted = sorted([len(loop) for loop in loops_array])
-
-    if loops_dict_sorted != loops_array_sorted:
+    # Same multiset of lengths
+    ref_sorted = np.sort(ref_lens)
+    array_sorted = np.sort(array_lens)
+    if not np.array_equal(ref_sorted, array_sorted):
         print(f"  ✗ FAIL: Loop lengths differ")
-        print(f"    Dict: {loops_dict_sorted}")
-        print(f"    Array: {loops_array_sorted}")
+        print(f"    Reference: {ref_sorted.tolist()}")
+        print(f"    Numba: {array_sorted.tolist()}")
         return False
 
-    print(f"  ✓ Both backends find {len(loops_dict)} loops with same lengths")
+    print(f"  ✓ Numba and reference both find {len(loops_ref)} loops with same lengths")
 
     # Test 6: Connection modifications
     print("\n[6] Testing add/remove connection operations...")
 
-    # Test on fresh grids
-    grid_dict = HexGrid(size)
-    grid_dict._use_array = False
-    grid_dict.reset_to_organized()
-
-    grid_array = HexGrid(size)
-    grid_array._use_array = True
-    grid_array.reset_to_organized()
+    # Back to the organized state on the same grid (tables are unchanged)
+    grid.reset_to_organized()
 
     # Remove a connection
     test_c, test_r = 0, 0
     test_dir = 0
 
-    grid_dict.remove_connection(test_c, test_r, test_dir)
-    grid_array.remove_connection(test_c, test_r, test_dir)
+    grid.remove_connection(test_c, test_r, test_dir)
 
-    # Check if both removed
-    dict_has = grid_dict.has_connection(test_c, test_r, test_dir)
-    array_has = grid_array.has_connection(test_c, test_r, test_dir)
+    # Check both ends removed
+    nc, nr = grid.get_neighbor_coords(test_c, test_r, test_dir)
+    has = grid.has_connection(test_c, test_r, test_dir)
+    neighbor_has = grid.has_connection(nc, nr, (test_dir + 3) % 6)
 
-    if dict_has or array_has:
-        print(f"  ✗ FAIL: Connection not removed (dict={dict_has}, array={array_has})")
+    if has or neighbor_has:
+        print(f"  ✗ FAIL: Connection not removed (cell={has}, neighbor={neighbor_has})")
         return False
 
     # Add it back
-    grid_dict.add_connection(test_c, test_r, test_dir)
-    grid_array.add_connection(test_c, test_r, test_dir)
+    grid.add_connection(test_c, test_r, test_dir)
 
-    dict_has = grid_dict.has_connection(test_c, test_r, test_dir)
-    array_has = grid_array.has_connection(test_c, test_r, test_dir)
+    has = grid.has_connection(test_c, test_r, test_dir)
+    neighbor_has = grid.has_connection(nc, nr, (test_dir + 3) % 6)
 
-    if not dict_has or not array_has:
-        print(f"  ✗ FAIL: Connection not added (dict={dict_has}, array={array_has})")
+    if not has or not neighbor_has:
+        print(f"  ✗ FAIL: Connection not added (cell={has}, neighbor={neighbor_has})")
         return False
 
-    print("  ✓ Add/remove operations work correctly on both backends")
+    print("  ✓ Add/remove operations work correctly")
 
     return True
 
+def _validate_task(size):
+    """Validate one size in a worker process; returns (passed, output)"""
+    return capture(validate_backend_equivalence, size, max(5, size // 2))
+
 def main():
     """Run validation suite"""
     print("\n" + "="*60)
-    print("PHASE 2A ARRAY BACKEND VALIDATION")
+    print("ARRAY BACKEND VALIDATION")
     print("="*60)
 
     sizes = [10, 25, 50]
 
-    for size in sizes:
-        steps = max(5, size // 2)
-        if not validate_backend_equivalence(size, steps):
+    # Sizes are independent; validate them in parallel and report in order
+    outcomes = map_sizes(_validate_task, sizes)
+
+    for size, (passed, output) in zip(sizes, outcomes):
+        print(output, end='')
+        if not passed:
             print(f"\n{'='*60}")
             print(f"VALIDATION FAILED at N={size}")
             print(f"{'='*60}")
@@ -195,8 +218,6 @@ def main():
     print(f"\n{'='*60}")
     print("✓ ALL VALIDATIONS PASSED")
     print(f"{'='*60}")
-    print("\nArray backend is ready to use!")
-    print("To enable: Set grid._use_array = True in app.py line 50")
 
     return True
 
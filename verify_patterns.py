@@ -1,11 +1,28 @@
 
 import json
-import sys
+
+import numpy as np
+
+from app import HexGrid
+from _grid_probe import capture, map_sizes, neighbor_lut, probe_invariants
+
+# Shared HTTP session for the live-server checks, created on first use so
+# the direct HexGrid checks don't need requests installed
+_SESSION = None
+
+def _session():
+    global _SESSION
+    if _SESSION is None:
+        import requests
+        _SESSION = requests.Session()
+        _SESSION.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=8))
+    return _SESSION
 
 def test_reset_pattern(pattern_name):
     print(f"Testing pattern: {pattern_name}")
     try:
-        response = requests.post('http://localhost:3000/reset', json={'size': 10, 'pattern': pattern_name})
+        response = _session().post('http://localhost:3000/reset',
+                                   json={'size': 10, 'pattern': pattern_name}, timeout=5)
         if response.status_code == 200:
             data = response.json()
             cells = data['cells']
@@ -31,41 +48,57 @@ def main():
     # Since I can't easily start background server and keep it running across tool calls without complex management,
     # I will rely on the fact that I can't easily run the server and test it in one go if it blocks.
     # But I can import app and test logic directly!
-    
-    sys.path.append('.')
-    from app import HexGrid
-    
+
     print("Testing HexGrid initialization logic directly...")
     
-    patterns = ["vertical", "diagonal_1", "diagonal_2", "concentric"]
-    
-    for size in [10, 85]:
-        print(f"\nTesting size N={size}")
-        for p in patterns:
-            print(f"  Pattern: {p}")
-            grid = HexGrid(size)
-            grid.reset_to_organized(pattern=p)
-        
+    sizes = [10, 85]
+
+    # One task per size (the grid is reused across patterns within a size);
+    # run them in parallel and print each size's report in order
+    for output in map_sizes(_verify_task, sizes):
+        print(output, end='')
+
+PATTERNS = ["vertical", "diagonal_1", "diagonal_2", "concentric"]
+
+def _verify_task(size):
+    """Check every pattern at one size in a worker process; returns the output"""
+    return capture(_verify_size, size)[1]
+
+def _verify_size(size):
+    print(f"\nTesting size N={size}")
+    grid = HexGrid(size)
+
+    # The grid's neighbor table against the independent meshgrid LUT
+    if np.array_equal(grid.neighbor_table, neighbor_lut(size)):
+        print("  ✓ Neighbor table matches LUT")
+    else:
+        print("  ✗ Neighbor table differs from LUT")
+
+    for p in PATTERNS:
+        print(f"  Pattern: {p}")
+        grid.reset_to_organized(pattern=p)
+
         # Check if grid is populated
-        if grid._use_array:
-            # Check if array has non-zero values
-            if grid.cells_array.any():
-                print("  ✓ Array backend populated")
-            else:
-                print("  ✗ Array backend empty")
-        
-        # Check degree 2
-        violations = 0
-        for c in range(10):
-            for r in range(10):
-                doors = grid.get_cell_doors(c, r)
-                if len(doors) != 2:
-                    violations += 1
-        
+        if grid.cells_array.any():
+            print("  ✓ Array backend populated")
+        else:
+            print("  ✗ Array backend empty")
+
+        deg, missing = probe_invariants(grid)
+
+        # Check degree 2 over all size x size cells
+        violations = int((deg != 2).sum())
         if violations == 0:
             print("  ✓ Degree-2 constraint satisfied")
         else:
             print(f"  ✗ Degree-2 violations: {violations}")
 
+        # Every open door is matched by the neighbor's opposite door
+        unmatched = int(missing.sum())
+        if unmatched == 0:
+            print("  ✓ Connections symmetric")
+        else:
+            print(f"  ✗ Unmatched connections: {unmatched}")
+
 if __name__ == "__main__":
     main()